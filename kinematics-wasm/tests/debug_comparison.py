@@ -21,6 +21,9 @@ PASSIVE_ORIENTATION_OFFSET = [
     [np.pi, 2.10388e-17, 4.15523e-17]
 ]
 
+# Passive orientation corrections, stacked (7, 3, 3)
+PASSIVE_CORRECTIONS = R.from_euler("xyz", np.asarray(PASSIVE_ORIENTATION_OFFSET)).as_matrix()
+
 STEWART_ROD_DIR_IN_PASSIVE_FRAME = np.array([
     [1, 0, 0],
     [ 0.50606941, -0.85796418, -0.08826792],
@@ -39,9 +42,6 @@ def debug_passive_joint_calculation():
     data = load_kinematics_data()
     motors = data["motors"]
     
-    # Pre-compute passive corrections
-    passive_corrections = [R.from_euler("xyz", offset).as_matrix() for offset in PASSIVE_ORIENTATION_OFFSET]
-    
     # Test case: identity pose, zero joints
     joints = np.array([0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
     T_head = np.eye(4)
@@ -70,12 +70,6 @@ def debug_passive_joint_calculation():
     print(f"\nT_motor_servo_arm:")
     print(T_motor_servo_arm)
     
-    # T_world_motor for each motor
-    T_world_motors = []
-    for motor in motors:
-        T_w_motor = np.linalg.inv(np.array(motor["T_motor_world"]))
-        T_world_motors.append(T_w_motor)
-    
     # Calculate for first motor (stewart_1)
     i = 0
     motor = motors[i]
@@ -91,7 +85,8 @@ def debug_passive_joint_calculation():
     print(f"\nR_servo (for stewart joint={joints[i+1]}):")
     print(R_servo)
     
-    T_world_motor = T_world_motors[i]
+    # Only this motor's inverse is needed here
+    T_world_motor = np.linalg.inv(np.array(motor["T_motor_world"]))
     print(f"\nT_world_motor (inv of T_motor_world):")
     print(T_world_motor)
     
@@ -102,9 +97,9 @@ def debug_passive_joint_calculation():
     print(f"P_world_servo_arm: {P_world_servo_arm}")
     
     print(f"\npassive_corrections[{i}]:")
-    print(passive_corrections[i])
+    print(PASSIVE_CORRECTIONS[i])
     
-    R_world_servo = T_world_motor[:3, :3] @ R_servo @ passive_corrections[i]
+    R_world_servo = T_world_motor[:3, :3] @ R_servo @ PASSIVE_CORRECTIONS[i]
     print(f"\nR_world_servo:")
     print(R_world_servo)
     
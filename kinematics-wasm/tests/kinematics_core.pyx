@@ -0,0 +1,163 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Cython version of the passive joints calculation core.
+Same algorithm and arguments as _passive_joints_njit in test_comparison.py.
+
+Build in place with:
+    python setup.py build_ext --inplace
+"""
+
+import numpy as np
+from libc.math cimport atan2, asin, cos, sin, sqrt, hypot, M_PI
+
+cdef double HEAD_Z_OFFSET = 0.177
+cdef double MOTOR_ARM_LENGTH = 0.04
+
+
+cdef inline void _matmul_t3(double[:, ::1] a, double[:, ::1] b, double[:, ::1] out) noexcept nogil:
+    """out = a.T @ b for 3x3 matrices."""
+    cdef int i, j
+    for i in range(3):
+        for j in range(3):
+            out[i, j] = a[0, i] * b[0, j] + a[1, i] * b[1, j] + a[2, i] * b[2, j]
+
+
+cdef inline void _euler_xyz(double[:, ::1] r, double[::1] out, int offset) noexcept nogil:
+    """Write the XYZ Euler angles of rotation matrix r (same as R.as_euler("XYZ")) to out[offset:offset+3]."""
+    cdef double sin_y = min(1.0, max(-1.0, r[0, 2]))
+    if hypot(r[0, 0], r[0, 1]) > 1e-7:
+        out[offset] = atan2(-r[1, 2], r[2, 2])
+        out[offset + 1] = asin(sin_y)
+        out[offset + 2] = atan2(-r[0, 1], r[0, 0])
+    else:
+        # Gimbal lock: third angle set to zero
+        out[offset] = atan2(r[2, 1], r[1, 1])
+        out[offset + 1] = M_PI / 2 if sin_y > 0.0 else -M_PI / 2
+        out[offset + 2] = 0.0
+
+
+def calculate_passive_joints_c(double[::1] joints, double[:, ::1] head_R, double[::1] head_t,
+                               double[:, :, ::1] T_world_motor_R, double[:, ::1] T_world_motor_t,
+                               double[:, ::1] branch_positions, double[:, :, ::1] passive_corrections,
+                               double[:, ::1] rod_dirs, double[:, ::1] T_head_xl330_R):
+    """
+    Scalar core of calculate_passive_joints with explicit 3x3 loops.
+
+    Returns:
+        np.ndarray: (21,) passive joint angles
+    """
+    result = np.empty(21)
+    cdef double[::1] passive_joints = result
+    cdef double[:, ::1] pose_R = np.empty((3, 3))
+    cdef double[::1] pose_t = np.empty(3)
+    cdef double[:, ::1] R_servo_branch = np.empty((3, 3))
+    cdef double[:, ::1] R_dof = np.empty((3, 3))
+    cdef double[:, ::1] tmp = np.empty((3, 3))
+    cdef double vec[3]
+    cdef double vec_in_motor[3]
+    cdef double cos_yaw, sin_yaw, cos_z = 1.0, sin_z = 0.0
+    cdef double branch_pos_world, servo_arm_world, x, y, z, norm_vec
+    cdef double ax, ay, az, bx, by, bz, vx, vy, vz, nx, ny, nz, n_norm, cos_angle, k
+    cdef int i, j, m
+
+    with nogil:
+        # Inverse body yaw applied to the head pose (with HEAD_Z_OFFSET)
+        cos_yaw = cos(joints[0])
+        sin_yaw = sin(joints[0])
+        for j in range(3):
+            pose_R[0, j] = cos_yaw * head_R[0, j] + sin_yaw * head_R[1, j]
+            pose_R[1, j] = -sin_yaw * head_R[0, j] + cos_yaw * head_R[1, j]
+            pose_R[2, j] = head_R[2, j]
+        pose_t[0] = cos_yaw * head_t[0] + sin_yaw * head_t[1]
+        pose_t[1] = -sin_yaw * head_t[0] + cos_yaw * head_t[1]
+        pose_t[2] = head_t[2] + HEAD_Z_OFFSET
+
+        for i in range(6):
+            cos_z = cos(joints[i + 1])
+            sin_z = sin(joints[i + 1])
+
+            # Servo -> branch vector in world frame
+            for m in range(3):
+                branch_pos_world = (pose_R[m, 0] * branch_positions[i, 0]
+                                    + pose_R[m, 1] * branch_positions[i, 1]
+                                    + pose_R[m, 2] * branch_positions[i, 2] + pose_t[m])
+                servo_arm_world = (T_world_motor_R[i, m, 0] * cos_z * MOTOR_ARM_LENGTH
+                                   + T_world_motor_R[i, m, 1] * sin_z * MOTOR_ARM_LENGTH
+                                   + T_world_motor_t[i, m])
+                vec[m] = branch_pos_world - servo_arm_world
+
+            # Into the servo passive frame: passive_corrections.T @ R_servo.T @ T_world_motor_R.T
+            for m in range(3):
+                vec_in_motor[m] = (T_world_motor_R[i, 0, m] * vec[0]
+                                   + T_world_motor_R[i, 1, m] * vec[1]
+                                   + T_world_motor_R[i, 2, m] * vec[2])
+            x = cos_z * vec_in_motor[0] + sin_z * vec_in_motor[1]
+            y = -sin_z * vec_in_motor[0] + cos_z * vec_in_motor[1]
+            z = vec_in_motor[2]
+            for m in range(3):
+                vec[m] = (passive_corrections[i, 0, m] * x
+                          + passive_corrections[i, 1, m] * y
+                          + passive_corrections[i, 2, m] * z)
+
+            norm_vec = sqrt(vec[0] * vec[0] + vec[1] * vec[1] + vec[2] * vec[2])
+            ax = vec[0] / norm_vec
+            ay = vec[1] / norm_vec
+            az = vec[2] / norm_vec
+            bx = rod_dirs[i, 0]
+            by = rod_dirs[i, 1]
+            bz = rod_dirs[i, 2]
+
+            # Rodrigues rotation taking the rod direction b onto the line direction a
+            cos_angle = ax * bx + ay * by + az * bz
+            if cos_angle < -1.0 + 1e-12:
+                # Anti-parallel: 180 degrees around an axis perpendicular to b
+                nx, ny, nz = 0.0, bz, -by
+                if ny * ny + nz * nz < 1e-6:
+                    nx, ny, nz = -bz, 0.0, bx
+                n_norm = sqrt(nx * nx + ny * ny + nz * nz)
+                nx /= n_norm
+                ny /= n_norm
+                nz /= n_norm
+                R_servo_branch[0, 0] = 2.0 * nx * nx - 1.0
+                R_servo_branch[0, 1] = 2.0 * nx * ny
+                R_servo_branch[0, 2] = 2.0 * nx * nz
+                R_servo_branch[1, 0] = 2.0 * ny * nx
+                R_servo_branch[1, 1] = 2.0 * ny * ny - 1.0
+                R_servo_branch[1, 2] = 2.0 * ny * nz
+                R_servo_branch[2, 0] = 2.0 * nz * nx
+                R_servo_branch[2, 1] = 2.0 * nz * ny
+                R_servo_branch[2, 2] = 2.0 * nz * nz - 1.0
+            else:
+                vx = by * az - bz * ay
+                vy = bz * ax - bx * az
+                vz = bx * ay - by * ax
+                k = 1.0 / (1.0 + cos_angle)
+                R_servo_branch[0, 0] = vx * vx * k + cos_angle
+                R_servo_branch[0, 1] = vx * vy * k - vz
+                R_servo_branch[0, 2] = vx * vz * k + vy
+                R_servo_branch[1, 0] = vy * vx * k + vz
+                R_servo_branch[1, 1] = vy * vy * k + cos_angle
+                R_servo_branch[1, 2] = vy * vz * k - vx
+                R_servo_branch[2, 0] = vz * vx * k - vy
+                R_servo_branch[2, 1] = vz * vy * k + vx
+                R_servo_branch[2, 2] = vz * vz * k + cos_angle
+
+            _euler_xyz(R_servo_branch, passive_joints, i * 3)
+
+        # 7th passive joint, same right-to-left chain as the numpy version (motor 6)
+        for i in range(3):
+            for j in range(3):
+                R_dof[i, j] = (pose_R[i, 0] * T_head_xl330_R[0, j]
+                               + pose_R[i, 1] * T_head_xl330_R[1, j]
+                               + pose_R[i, 2] * T_head_xl330_R[2, j])
+        _matmul_t3(T_world_motor_R[5], R_dof, tmp)
+        for j in range(3):
+            R_dof[0, j] = cos_z * tmp[0, j] + sin_z * tmp[1, j]
+            R_dof[1, j] = -sin_z * tmp[0, j] + cos_z * tmp[1, j]
+            R_dof[2, j] = tmp[2, j]
+        _matmul_t3(passive_corrections[5], R_dof, tmp)
+        _matmul_t3(R_servo_branch, tmp, R_dof)
+        _matmul_t3(passive_corrections[6], R_dof, tmp)
+        _euler_xyz(tmp, passive_joints, 18)
+
+    return result
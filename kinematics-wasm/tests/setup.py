@@ -0,0 +1,12 @@
+"""
+Build the optional Cython kinematics core used by test_comparison.py:
+    python setup.py build_ext --inplace
+"""
+
+from Cython.Build import cythonize
+from setuptools import setup
+
+setup(
+    name="kinematics_core",
+    ext_modules=cythonize("kinematics_core.pyx", language_level=3),
+)
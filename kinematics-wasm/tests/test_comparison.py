@@ -2,14 +2,23 @@
 """
 Test script to compare Python vs Rust WASM passive joints calculation.
 Run this from the reachy_mini environment to get reference values.
+If numba is installed, the calculation core is JIT-compiled. A Cython build
+of the core (kinematics_core.pyx, see setup.py) is used instead when present.
 """
 
+import functools
 import json
 import numpy as np
 from scipy.spatial.transform import Rotation as R
 import sys
 import os
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Add reachy_mini to path
 sys.path.insert(0, '/Users/thibaudfrere/Documents/work-projects/huggingface/reachy-mini/standalone-app/reachy_mini/src')
 
@@ -33,6 +42,12 @@ PASSIVE_ORIENTATION_OFFSET = [
     [np.pi, 2.10388e-17, 4.15523e-17]
 ]
 
+# Passive orientation corrections as one stacked (7, 3, 3) array, plus their
+# transposes (C-contiguous) for the right-to-left chains below
+PASSIVE_ORIENTATION_OFFSET_ARR = np.asarray(PASSIVE_ORIENTATION_OFFSET)
+PASSIVE_CORRECTIONS = R.from_euler("xyz", PASSIVE_ORIENTATION_OFFSET_ARR).as_matrix()
+PASSIVE_CORRECTIONS_T = PASSIVE_CORRECTIONS.transpose(0, 2, 1).copy()
+
 STEWART_ROD_DIR_IN_PASSIVE_FRAME = np.array([
     [1, 0, 0],
     [ 0.50606941, -0.85796418, -0.08826792],
@@ -42,83 +57,352 @@ STEWART_ROD_DIR_IN_PASSIVE_FRAME = np.array([
     [-1, 0, 0]]
 )
 
+# Rodrigues alignment below expects unit vectors
+STEWART_ROD_DIR_UNIT = STEWART_ROD_DIR_IN_PASSIVE_FRAME / np.linalg.norm(
+    STEWART_ROD_DIR_IN_PASSIVE_FRAME, axis=1, keepdims=True)
+
+# T_HEAD_XL_330 is only given to 4 decimals; R.from_matrix() projects it onto the
+# nearest rotation, so the scalar Euler extraction needs the projected matrix too
+T_HEAD_XL_330_R = R.from_matrix(T_HEAD_XL_330[:3, :3]).as_matrix()
+
 def load_kinematics_data():
     """Load motor data from kinematics_data.json"""
     data_path = '/Users/thibaudfrere/Documents/work-projects/huggingface/reachy-mini/standalone-app/reachy_mini/src/reachy_mini/assets/kinematics_data.json'
     with open(data_path) as f:
         return json.load(f)
 
-def calculate_passive_joints_python(joints, T_head, motors, passive_corrections):
+def _align_vectors_batched(a, b, eps=1e-12):
     """
-    Python reference implementation of calculate_passive_joints.
-    Exactly matches the original code.
+    Closed-form equivalent of R.align_vectors(a[i], b[i]) for single vector pairs.
+
+    Builds the minimal rotation R such that R @ b = a with Rodrigues' formula
+    (no SVD, no trig). Anti-parallel pairs fall back to a 180 degree rotation
+    around an axis perpendicular to b.
+
+    Args:
+        a: (N,3) unit target vectors
+        b: (N,3) unit source vectors
+
+    Returns:
+        np.ndarray: (N,3,3) rotation matrices
+    """
+    v = np.cross(b, a)
+    cos_angle = (a * b).sum(-1)
+    anti_parallel = cos_angle < -1.0 + eps
+    k = 1.0 / np.where(anti_parallel, 1.0, 1.0 + cos_angle)
+
+    vx, vy, vz = v[:, 0], v[:, 1], v[:, 2]
+    r = np.empty((len(a), 3, 3))
+    r[:, 0, 0] = vx * vx * k + cos_angle
+    r[:, 0, 1] = vx * vy * k - vz
+    r[:, 0, 2] = vx * vz * k + vy
+    r[:, 1, 0] = vy * vx * k + vz
+    r[:, 1, 1] = vy * vy * k + cos_angle
+    r[:, 1, 2] = vy * vz * k - vx
+    r[:, 2, 0] = vz * vx * k - vy
+    r[:, 2, 1] = vz * vy * k + vx
+    r[:, 2, 2] = vz * vz * k + cos_angle
+
+    if anti_parallel.any():
+        # 180 degrees around n: R = 2 n n^T - I, with n perpendicular to b
+        perp = np.cross(b, [1.0, 0.0, 0.0])
+        small = np.linalg.norm(perp, axis=1) < 1e-3
+        perp[small] = np.cross(b[small], [0.0, 1.0, 0.0])
+        n = perp / np.linalg.norm(perp, axis=1, keepdims=True)
+        flip = 2.0 * n[:, :, None] * n[:, None, :] - np.eye(3)
+        r[anti_parallel] = flip[anti_parallel]
+
+    return r
+
+
+def precompute_world_motors(motors):
+    """
+    Invert and stack the per-motor constants so the 6 Stewart motors can be
+    processed with batched numpy operations.
+
+    Returns:
+        tuple: (T_world_motor_R (6,3,3), T_world_motor_t (6,3),
+                T_world_motor_R_T (6,3,3), branch_positions (6,3))
+    """
+    T_world_motors = np.linalg.inv(np.array([motor["T_motor_world"] for motor in motors]))
+    T_world_motor_R = np.ascontiguousarray(T_world_motors[:, :3, :3])
+    T_world_motor_t = np.ascontiguousarray(T_world_motors[:, :3, 3])
+    T_world_motor_R_T = T_world_motor_R.transpose(0, 2, 1).copy()
+    branch_positions = np.array([motor["branch_position"] for motor in motors])
+    return T_world_motor_R, T_world_motor_t, T_world_motor_R_T, branch_positions
+
+
+@functools.lru_cache(maxsize=None)
+def load_kinematics_cache():
+    """Load kinematics_data.json and precompute the motor data, once per process."""
+    motors = load_kinematics_data()["motors"]
+    return motors, precompute_world_motors(motors)
+
+
+def calculate_passive_joints_numpy(joints, T_head, cached):
+    """
+    NumPy implementation of calculate_passive_joints.
+    Exactly matches the original code, with the 6 motors processed as stacked arrays.
+
+    Args:
+        joints: Array of 7 floats [yaw_body, stewart_1, ..., stewart_6]
+        T_head: 4x4 head pose
+        cached: Tuple returned by precompute_world_motors()
+    """
+    T_world_motor_R, T_world_motor_t, T_world_motor_R_T, branch_positions = cached
+
+    # cos/sin of all 7 joints in one call each: [0] is body yaw, [1:] the servos
+    cos_joints = np.cos(joints)
+    sin_joints = np.sin(joints)
+
+    # Inverse rotation: rotate pose around Z by -body_yaw.
+    # Rotation and translation are kept separate, the 4x4 is never formed.
+    cos_yaw = cos_joints[0]
+    sin_yaw = sin_joints[0]
+    R_z_T = np.array([[cos_yaw, sin_yaw, 0.0], [-sin_yaw, cos_yaw, 0.0], [0.0, 0.0, 1.0]])
+    pose_R = R_z_T @ T_head[:3, :3]
+    pose_t = R_z_T @ (T_head[:3, 3] + [0.0, 0.0, HEAD_Z_OFFSET])
+
+    # Servo rotations around Z for all 6 motors, shape (6, 3, 3)
+    cos_z = cos_joints[1:7]
+    sin_z = sin_joints[1:7]
+    R_servo = np.zeros((6, 3, 3))
+    R_servo[:, 0, 0] = cos_z
+    R_servo[:, 0, 1] = -sin_z
+    R_servo[:, 1, 0] = sin_z
+    R_servo[:, 1, 1] = cos_z
+    R_servo[:, 2, 2] = 1.0
+
+    branch_pos_world = (pose_R @ branch_positions.T).T + pose_t
+
+    # The servo arm is a pure translation of MOTOR_ARM_LENGTH along local X
+    servo_pos_local = R_servo[:, :, 0] * MOTOR_ARM_LENGTH
+    P_world_servo_arm = np.einsum('bij,bj->bi', T_world_motor_R, servo_pos_local) + T_world_motor_t
+
+    # R_world_servo = T_world_motor_R @ R_servo @ passive_corrections, but only its
+    # transpose applied to a vector is needed: evaluate right-to-left as mat-vec products
+    vec_servo_to_branch = branch_pos_world - P_world_servo_arm
+    vec_in_motor = np.einsum('bij,bj->bi', T_world_motor_R_T, vec_servo_to_branch)
+    vec_in_servo = np.einsum('bji,bj->bi', R_servo, vec_in_motor)
+    vec_servo_to_branch_in_servo = np.einsum('bij,bj->bi', PASSIVE_CORRECTIONS_T[:6], vec_in_servo)
+
+    norm_vec = np.linalg.norm(vec_servo_to_branch_in_servo, axis=1, keepdims=True)
+    straight_line_dirs = vec_servo_to_branch_in_servo / norm_vec
+
+    # Rotations aligning each rod direction with its servo -> branch line, shape (6, 3, 3)
+    R_servo_branch = _align_vectors_batched(straight_line_dirs, STEWART_ROD_DIR_UNIT)
+
+    # 7th passive joint
+    # R_dof = R_rod_current.T @ R_head_xl330 with
+    # R_rod_current = T_world_motor_R[5] @ R_servo[5] @ PASSIVE_CORRECTIONS[5] @ R_servo_branch[5] @ PASSIVE_CORRECTIONS[6]
+    R_head_xl330 = pose_R @ T_HEAD_XL_330[:3, :3]
+    R_dof = T_world_motor_R_T[5] @ R_head_xl330
+    R_dof = R_servo[5].T @ R_dof
+    R_dof = PASSIVE_CORRECTIONS_T[5] @ R_dof
+    R_dof = R_servo_branch[5].T @ R_dof
+    R_dof = PASSIVE_CORRECTIONS_T[6] @ R_dof
+
+    # Euler angles of all 7 passive joints from a single stacked conversion
+    R_passive = np.concatenate([R_servo_branch, R_dof[np.newaxis]])
+    return R.from_matrix(R_passive).as_euler("XYZ").ravel()
+
+
+def _jit(func):
+    """Compile with numba when available, otherwise leave as plain Python."""
+    if NUMBA_AVAILABLE:
+        return njit(cache=True, fastmath=True, boundscheck=False)(func)
+    return func
+
+
+@_jit
+def _matmul_t3(a, b, out):
+    """out = a.T @ b for 3x3 matrices."""
+    for i in range(3):
+        for j in range(3):
+            out[i, j] = a[0, i] * b[0, j] + a[1, i] * b[1, j] + a[2, i] * b[2, j]
+
+
+@_jit
+def _euler_xyz(r, out, offset):
+    """Write the XYZ Euler angles of rotation matrix r (same as R.as_euler("XYZ")) to out[offset:offset+3]."""
+    sin_y = min(1.0, max(-1.0, r[0, 2]))
+    if np.hypot(r[0, 0], r[0, 1]) > 1e-7:
+        out[offset] = np.arctan2(-r[1, 2], r[2, 2])
+        out[offset + 1] = np.arcsin(sin_y)
+        out[offset + 2] = np.arctan2(-r[0, 1], r[0, 0])
+    else:
+        # Gimbal lock: third angle set to zero
+        out[offset] = np.arctan2(r[2, 1], r[1, 1])
+        out[offset + 1] = np.pi / 2 if sin_y > 0.0 else -np.pi / 2
+        out[offset + 2] = 0.0
+
+
+@_jit
+def _passive_joints_njit(joints, head_R, head_t, T_world_motor_R, T_world_motor_t,
+                         branch_positions, passive_corrections, rod_dirs, T_head_xl330_R):
+    """
+    Scalar core of calculate_passive_joints, written with explicit 3x3 loops
+    so numba can compile it without any numpy dispatch.
+
+    Returns:
+        np.ndarray: (21,) passive joint angles
     """
-    _pose = T_head.copy()
-    _pose[:3, 3][2] += HEAD_Z_OFFSET
+    passive_joints = np.empty(21)
 
-    # Inverse rotation: rotate pose around Z by -body_yaw
+    # Inverse body yaw applied to the head pose (with HEAD_Z_OFFSET)
     cos_yaw = np.cos(joints[0])
     sin_yaw = np.sin(joints[0])
-    R_z = np.array([[cos_yaw, -sin_yaw, 0.0], [sin_yaw, cos_yaw, 0.0], [0.0, 0.0, 1.0]])
-    _pose = np.block([[R_z.T, np.zeros((3, 1))], [0.0, 0.0, 0.0, 1.0]]) @ _pose 
+    pose_R = np.empty((3, 3))
+    for j in range(3):
+        pose_R[0, j] = cos_yaw * head_R[0, j] + sin_yaw * head_R[1, j]
+        pose_R[1, j] = -sin_yaw * head_R[0, j] + cos_yaw * head_R[1, j]
+        pose_R[2, j] = head_R[2, j]
+    pose_t = np.empty(3)
+    pose_t[0] = cos_yaw * head_t[0] + sin_yaw * head_t[1]
+    pose_t[1] = -sin_yaw * head_t[0] + cos_yaw * head_t[1]
+    pose_t[2] = head_t[2] + HEAD_Z_OFFSET
 
-    passive_joints = np.zeros(21)
-    T_motor_servo_arm = np.eye(4)
-    T_motor_servo_arm[:3, 3][0] = MOTOR_ARM_LENGTH
-    
-    T_world_motors = []
-    for motor in motors:
-        T_w_motor = np.linalg.inv(np.array(motor["T_motor_world"]))
-        T_world_motors.append(T_w_motor)
+    vec = np.empty(3)
+    vec_in_motor = np.empty(3)
+    R_servo_branch = np.empty((3, 3))
+    cos_z = 1.0
+    sin_z = 0.0
 
-    R_servo_branch = None
-    R_world_servo = None
-    
-    for i, motor in enumerate(motors):
-        branch_pos_world = _pose[:3, :3] @ np.array(motor["branch_position"]) + _pose[:3, 3]
-        
-        cos_z = np.cos(joints[i+1])
-        sin_z = np.sin(joints[i+1])
-        R_servo = np.array([[cos_z, -sin_z, 0], [sin_z, cos_z, 0], [0, 0, 1]])
-        
-        T_world_motor = T_world_motors[i]
-        servo_pos_local = R_servo @ T_motor_servo_arm[:3, 3]
-        P_world_servo_arm = T_world_motor[:3, :3] @ servo_pos_local + T_world_motor[:3, 3]
-        
-        R_world_servo = T_world_motor[:3, :3] @ R_servo @ passive_corrections[i]
-        
-        vec_servo_to_branch = branch_pos_world - P_world_servo_arm
-        vec_servo_to_branch_in_servo = R_world_servo.T @ vec_servo_to_branch
-        
-        rod_dir = STEWART_ROD_DIR_IN_PASSIVE_FRAME[i]
-        norm_vec = np.linalg.norm(vec_servo_to_branch_in_servo)
-        straight_line_dir = vec_servo_to_branch_in_servo / norm_vec
-        R_servo_branch, _ = R.align_vectors(np.array([straight_line_dir]), np.array([rod_dir]))
-        euler = R_servo_branch.as_euler("XYZ")
-        
-        passive_joints[i*3:i*3+3] = euler
+    for i in range(6):
+        cos_z = np.cos(joints[i + 1])
+        sin_z = np.sin(joints[i + 1])
+
+        # Servo -> branch vector in world frame
+        for k in range(3):
+            branch_pos_world = (pose_R[k, 0] * branch_positions[i, 0]
+                                + pose_R[k, 1] * branch_positions[i, 1]
+                                + pose_R[k, 2] * branch_positions[i, 2] + pose_t[k])
+            servo_arm_world = (T_world_motor_R[i, k, 0] * cos_z * MOTOR_ARM_LENGTH
+                               + T_world_motor_R[i, k, 1] * sin_z * MOTOR_ARM_LENGTH
+                               + T_world_motor_t[i, k])
+            vec[k] = branch_pos_world - servo_arm_world
+
+        # Into the servo passive frame: passive_corrections.T @ R_servo.T @ T_world_motor_R.T
+        for k in range(3):
+            vec_in_motor[k] = (T_world_motor_R[i, 0, k] * vec[0]
+                               + T_world_motor_R[i, 1, k] * vec[1]
+                               + T_world_motor_R[i, 2, k] * vec[2])
+        x = cos_z * vec_in_motor[0] + sin_z * vec_in_motor[1]
+        y = -sin_z * vec_in_motor[0] + cos_z * vec_in_motor[1]
+        z = vec_in_motor[2]
+        for k in range(3):
+            vec[k] = (passive_corrections[i, 0, k] * x
+                      + passive_corrections[i, 1, k] * y
+                      + passive_corrections[i, 2, k] * z)
+
+        norm_vec = np.sqrt(vec[0] * vec[0] + vec[1] * vec[1] + vec[2] * vec[2])
+        ax = vec[0] / norm_vec
+        ay = vec[1] / norm_vec
+        az = vec[2] / norm_vec
+        bx = rod_dirs[i, 0]
+        by = rod_dirs[i, 1]
+        bz = rod_dirs[i, 2]
+
+        # Rodrigues rotation taking the rod direction b onto the line direction a
+        cos_angle = ax * bx + ay * by + az * bz
+        if cos_angle < -1.0 + 1e-12:
+            # Anti-parallel: 180 degrees around an axis perpendicular to b
+            nx, ny, nz = 0.0, bz, -by
+            if ny * ny + nz * nz < 1e-6:
+                nx, ny, nz = -bz, 0.0, bx
+            n_norm = np.sqrt(nx * nx + ny * ny + nz * nz)
+            nx /= n_norm
+            ny /= n_norm
+            nz /= n_norm
+            R_servo_branch[0, 0] = 2.0 * nx * nx - 1.0
+            R_servo_branch[0, 1] = 2.0 * nx * ny
+            R_servo_branch[0, 2] = 2.0 * nx * nz
+            R_servo_branch[1, 0] = 2.0 * ny * nx
+            R_servo_branch[1, 1] = 2.0 * ny * ny - 1.0
+            R_servo_branch[1, 2] = 2.0 * ny * nz
+            R_servo_branch[2, 0] = 2.0 * nz * nx
+            R_servo_branch[2, 1] = 2.0 * nz * ny
+            R_servo_branch[2, 2] = 2.0 * nz * nz - 1.0
+        else:
+            vx = by * az - bz * ay
+            vy = bz * ax - bx * az
+            vz = bx * ay - by * ax
+            k = 1.0 / (1.0 + cos_angle)
+            R_servo_branch[0, 0] = vx * vx * k + cos_angle
+            R_servo_branch[0, 1] = vx * vy * k - vz
+            R_servo_branch[0, 2] = vx * vz * k + vy
+            R_servo_branch[1, 0] = vy * vx * k + vz
+            R_servo_branch[1, 1] = vy * vy * k + cos_angle
+            R_servo_branch[1, 2] = vy * vz * k - vx
+            R_servo_branch[2, 0] = vz * vx * k - vy
+            R_servo_branch[2, 1] = vz * vy * k + vx
+            R_servo_branch[2, 2] = vz * vz * k + cos_angle
+
+        _euler_xyz(R_servo_branch, passive_joints, i * 3)
+
+    # 7th passive joint, same right-to-left chain as the numpy version (motor 6)
+    R_dof = np.empty((3, 3))
+    tmp = np.empty((3, 3))
+    for i in range(3):
+        for j in range(3):
+            R_dof[i, j] = (pose_R[i, 0] * T_head_xl330_R[0, j]
+                           + pose_R[i, 1] * T_head_xl330_R[1, j]
+                           + pose_R[i, 2] * T_head_xl330_R[2, j])
+    _matmul_t3(T_world_motor_R[5], R_dof, tmp)
+    for j in range(3):
+        R_dof[0, j] = cos_z * tmp[0, j] + sin_z * tmp[1, j]
+        R_dof[1, j] = -sin_z * tmp[0, j] + cos_z * tmp[1, j]
+        R_dof[2, j] = tmp[2, j]
+    _matmul_t3(passive_corrections[5], R_dof, tmp)
+    _matmul_t3(R_servo_branch, tmp, R_dof)
+    _matmul_t3(passive_corrections[6], R_dof, tmp)
+    _euler_xyz(tmp, passive_joints, 18)
 
-    # 7th passive joint
-    R_servo_branch_mat = R_servo_branch.as_matrix()
-    R_head_xl330 = _pose[:3, :3] @ T_HEAD_XL_330[:3, :3]
-    R_rod_current = R_world_servo @ R_servo_branch_mat @ passive_corrections[6]
-    R_dof = R_rod_current.T @ R_head_xl330
-    euler_7 = R.from_matrix(R_dof).as_euler("XYZ")
-    passive_joints[18:21] = euler_7
-    
     return passive_joints
 
 
+# Fastest available core: compiled Cython extension (see setup.py), then numba
+try:
+    from kinematics_core import calculate_passive_joints_c as _passive_joints_core
+except ImportError:
+    _passive_joints_core = _passive_joints_njit if NUMBA_AVAILABLE else None
+
+
+def calculate_passive_joints_python(joints, T_head, cached):
+    """
+    Python reference implementation of calculate_passive_joints.
+    Uses the compiled Cython or numba core when available, the NumPy version otherwise.
+
+    Args:
+        joints: Array of 7 floats [yaw_body, stewart_1, ..., stewart_6]
+        T_head: 4x4 head pose
+        cached: Tuple returned by precompute_world_motors()
+    """
+    if _passive_joints_core is None:
+        return calculate_passive_joints_numpy(joints, T_head, cached)
+
+    T_world_motor_R, T_world_motor_t, _, branch_positions = cached
+    T_head = np.asarray(T_head, dtype=np.float64)
+    return _passive_joints_core(
+        np.ascontiguousarray(joints, dtype=np.float64),
+        np.ascontiguousarray(T_head[:3, :3]),
+        np.ascontiguousarray(T_head[:3, 3]),
+        T_world_motor_R,
+        T_world_motor_t,
+        branch_positions,
+        PASSIVE_CORRECTIONS,
+        STEWART_ROD_DIR_UNIT,
+        T_HEAD_XL_330_R,
+    )
+
+
 def main():
     print("=" * 60)
     print("PASSIVE JOINTS CALCULATION - PYTHON REFERENCE")
     print("=" * 60)
     
-    data = load_kinematics_data()
-    motors = data["motors"]
-    
-    # Pre-compute passive corrections
-    passive_corrections = [R.from_euler("xyz", offset).as_matrix() for offset in PASSIVE_ORIENTATION_OFFSET]
+    # Motor data and passive corrections are inverted/stacked once and reused
+    motors, cached = load_kinematics_cache()
     
     # Test cases
     test_cases = [
@@ -154,7 +438,7 @@ def main():
     
     for tc in test_cases:
         print(f"// Test: {tc['name']}")
-        result = calculate_passive_joints_python(tc["joints"], tc["head_pose"], motors, passive_corrections)
+        result = calculate_passive_joints_python(tc["joints"], tc["head_pose"], cached)
         
         # Print joints
         joints_str = ", ".join([f"{v:.10f}" for v in tc["joints"]])
@@ -179,8 +463,11 @@ def main():
     
     # Print T_world_motor matrices for verification
     print("\n// T_world_motor matrices (inv of T_motor_world):")
+    T_world_motor_R, T_world_motor_t = cached[0], cached[1]
     for i, motor in enumerate(motors):
-        T_w_motor = np.linalg.inv(np.array(motor["T_motor_world"]))
+        T_w_motor = np.eye(4)
+        T_w_motor[:3, :3] = T_world_motor_R[i]
+        T_w_motor[:3, 3] = T_world_motor_t[i]
         print(f"// Motor {i+1} ({motor['name']}):")
         for row in range(4):
             row_str = ", ".join([f"{T_w_motor[row, col]:.16f}" for col in range(4)])
@@ -20,35 +20,38 @@ import os
 import sys
 
 
-def fix_avast_ssl_injection():
+def fix_avast_ssl_injection(verbose=True):
     """Remove Avast's injected SSLKEYLOGFILE to prevent permission errors."""
+    # Common case: variable not set, nothing to do
+    keylog_path = os.environ.get("SSLKEYLOGFILE")
+    if not keylog_path:
+        return
+    
     try:
-        if "SSLKEYLOGFILE" in os.environ:
-            keylog_path = os.environ["SSLKEYLOGFILE"]
-            
-            # Check if this is Avast's injected path (contains aswMonFltProxy)
-            # or if the directory doesn't exist (invalid path)
-            is_avast_path = "aswMonFltProxy" in keylog_path
-            is_invalid_path = False
-            
-            # Check if directory exists (safely handle errors)
-            try:
-                dirname = os.path.dirname(keylog_path)
-                if dirname and not os.path.exists(dirname):
-                    is_invalid_path = True
-            except (OSError, ValueError):
-                is_invalid_path = True
-            
-            if is_avast_path or is_invalid_path:
+        # Avast's injected path (contains aswMonFltProxy): no need to check the directory
+        if "aswMonFltProxy" in keylog_path:
+            del os.environ["SSLKEYLOGFILE"]
+            if verbose:
                 print(f"🛡️  Detected problematic SSLKEYLOGFILE: {keylog_path}")
-                if is_avast_path:
-                    print("    → Avast antivirus injection detected (aswMonFltProxy)")
-                if is_invalid_path:
-                    print("    → Invalid or inaccessible path")
-                print("🔧 Removing SSLKEYLOGFILE to prevent permission errors")
-                del os.environ["SSLKEYLOGFILE"]
-            else:
-                print(f"ℹ️  SSLKEYLOGFILE set to valid path: {keylog_path}")
+                print("    → Avast antivirus injection detected (aswMonFltProxy)")
+                print("🔧 Removed SSLKEYLOGFILE to prevent permission errors")
+            return
+        
+        # Otherwise only remove it if the directory doesn't exist (invalid path)
+        try:
+            dirname = os.path.dirname(keylog_path)
+            is_invalid_path = bool(dirname) and not os.path.isdir(dirname)
+        except (OSError, ValueError):
+            is_invalid_path = True
+        
+        if is_invalid_path:
+            del os.environ["SSLKEYLOGFILE"]
+            if verbose:
+                print(f"🛡️  Detected problematic SSLKEYLOGFILE: {keylog_path}")
+                print("    → Invalid or inaccessible path")
+                print("🔧 Removed SSLKEYLOGFILE to prevent permission errors")
+        elif verbose:
+            print(f"ℹ️  SSLKEYLOGFILE set to valid path: {keylog_path}")
     except Exception as e:
         # Don't fail if we can't fix it - just log and continue
         print(f"⚠️  Warning: Could not check SSLKEYLOGFILE: {e}")
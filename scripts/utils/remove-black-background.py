@@ -3,29 +3,43 @@
 Script to make the black background around PNG stickers transparent
 while preserving black pixels inside shapes.
 
-Uses a flood fill algorithm from the edges to identify
-only the black background connected to the image edges.
+Uses connected-component labeling (or a flood fill from the edges when
+scipy is not installed) to identify only the black background connected
+to the image edges.
 """
 
+import functools
 import os
+import shutil
 import sys
+import numpy as np
 from PIL import Image
-from collections import deque
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
+try:
+    from scipy import ndimage
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
 
-def is_black(pixel, threshold=30):
+
+# 4-connectivity (top, bottom, left, right), same neighbors as the flood fill
+FOUR_CONNECTIVITY = np.array([[0, 1, 0], [1, 1, 1], [0, 1, 0]])
+
+
+def get_black_mask(arr, threshold=30):
     """
-    Checks if a pixel is considered black (with tolerance).
+    Checks which pixels are considered black (with tolerance).
     
     Args:
-        pixel: Tuple (R, G, B) or (R, G, B, A)
+        arr: Image as a numpy array of shape (height, width, 3 or 4)
         threshold: Tolerance threshold for black (0-255)
     
     Returns:
-        bool: True if pixel is black
+        np.ndarray: Boolean mask (height, width), True where pixel is black
     """
-    r, g, b = pixel[0], pixel[1], pixel[2]
-    return r <= threshold and g <= threshold and b <= threshold
+    return (arr[..., :3] <= threshold).all(axis=-1)
 
 
 def get_border_pixels(width, height):
@@ -52,52 +66,130 @@ def get_border_pixels(width, height):
             yield (width - 1, y)
 
 
-def flood_fill_from_borders(img, black_threshold=30):
+def count_leading(flags):
+    """
+    Counts the leading True values of a boolean array.
+    
+    Args:
+        flags: 1D boolean numpy array
+    
+    Returns:
+        int: Length of the leading run of True values
+    """
+    return len(flags) if flags.all() else int(np.argmin(flags))
+
+
+def find_black_frame(black_mask):
+    """
+    Fast path for images whose background is a plain black frame.
+    
+    Measures the fully black rows/columns on each side, then checks that no
+    black pixel lies on the outline of the remaining interior. In that case
+    nothing can be connected to the edges beyond the frame itself.
+    
+    Args:
+        black_mask: Boolean mask (height, width) of black pixels
+    
+    Returns:
+        np.ndarray: Boolean mask of the frame, or None if a flood fill is needed
+    """
+    height, width = black_mask.shape
+    row_black = black_mask.all(axis=1)
+    col_black = black_mask.all(axis=0)
+    top = count_leading(row_black)
+    bottom = count_leading(row_black[::-1])
+    left = count_leading(col_black)
+    right = count_leading(col_black[::-1])
+    
+    frame = np.ones_like(black_mask)
+    if top + bottom >= height or left + right >= width:
+        # Entirely black image
+        return frame
+    
+    inner = black_mask[top:height - bottom, left:width - right]
+    if inner[0].any() or inner[-1].any() or inner[:, 0].any() or inner[:, -1].any():
+        return None
+    
+    frame[top:height - bottom, left:width - right] = False
+    return frame
+
+
+def flood_fill_from_borders(black_mask):
     """
     Identifies all black pixels connected to image edges
     using a flood fill algorithm.
     
     Args:
-        img: PIL Image in RGBA mode
-        black_threshold: Threshold to consider a pixel as black
+        black_mask: Boolean mask (height, width) of black pixels
     
     Returns:
-        set: Set of coordinates (x, y) of pixels to make transparent
+        np.ndarray: Boolean mask (height, width) of pixels to make transparent
     """
-    width, height = img.size
-    pixels = img.load()
-    to_remove = set()
-    visited = set()
+    height, width = black_mask.shape
+    # Flat row-major bitmaps: pixel (x, y) is at index y * width + x
+    black_flat = black_mask.tobytes()
+    # Only black pixels reached from an edge are ever visited, so the
+    # visited bitmap is also the set of pixels to remove
+    visited = bytearray(height * width)
+    max_x = width - 1
+    last_row_start = (height - 1) * width
     
     # Traverse all border pixels
     for start_x, start_y in get_border_pixels(width, height):
-        if (start_x, start_y) in visited:
+        start = start_y * width + start_x
+        if visited[start]:
             continue
         
-        pixel = pixels[start_x, start_y]
-        
         # If border pixel is black, start a flood fill
-        if is_black(pixel, black_threshold):
-            queue = deque([(start_x, start_y)])
-            visited.add((start_x, start_y))
+        if black_flat[start]:
+            # Queue of flat indices: no tuple allocated per pixel
+            queue = array("i", [start])
+            queue_append = queue.append
+            queue_head = 0
+            visited[start] = 1
             
-            while queue:
-                x, y = queue.popleft()
-                to_remove.add((x, y))
+            while queue_head < len(queue):
+                idx = queue[queue_head]
+                queue_head += 1
+                x = idx % width
                 
-                # Check 4 neighbors (top, bottom, left, right)
-                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                    nx, ny = x + dx, y + dy
-                    
-                    # Check boundaries
-                    if 0 <= nx < width and 0 <= ny < height:
-                        if (nx, ny) not in visited:
-                            neighbor_pixel = pixels[nx, ny]
-                            if is_black(neighbor_pixel, black_threshold):
-                                visited.add((nx, ny))
-                                queue.append((nx, ny))
+                # Check 4 neighbors (left, right, top, bottom), unrolled
+                if x > 0 and not visited[idx - 1] and black_flat[idx - 1]:
+                    visited[idx - 1] = 1
+                    queue_append(idx - 1)
+                if x < max_x and not visited[idx + 1] and black_flat[idx + 1]:
+                    visited[idx + 1] = 1
+                    queue_append(idx + 1)
+                if idx >= width and not visited[idx - width] and black_flat[idx - width]:
+                    visited[idx - width] = 1
+                    queue_append(idx - width)
+                if idx < last_row_start and not visited[idx + width] and black_flat[idx + width]:
+                    visited[idx + width] = 1
+                    queue_append(idx + width)
+    
+    return np.frombuffer(visited, dtype=bool).reshape(height, width)
+
+
+def label_border_background(black_mask):
+    """
+    Identifies all black pixels connected to image edges
+    using connected-component labeling (scipy.ndimage).
+    
+    Args:
+        black_mask: Boolean mask (height, width) of black pixels
+    
+    Returns:
+        np.ndarray: Boolean mask (height, width) of pixels to make transparent
+    """
+    labels, _ = ndimage.label(black_mask, structure=FOUR_CONNECTIVITY)
     
-    return to_remove
+    # Components touching any edge are background
+    border_labels = np.unique(np.concatenate([
+        labels[0, :], labels[-1, :], labels[:, 0], labels[:, -1]
+    ]))
+    border_labels = border_labels[border_labels != 0]
+    
+    return np.isin(labels, border_labels)
 
 
 def remove_black_background(input_path, output_path=None, black_threshold=30):
@@ -115,24 +207,61 @@ def remove_black_background(input_path, output_path=None, black_threshold=30):
     print(f"Processing: {os.path.basename(input_path)}")
     print(f"  Size: {img.size[0]}x{img.size[1]}")
     
+    if output_path is None:
+        output_path = input_path
+    
+    arr = np.array(img)
+    
+    # Background already removed: nothing to do
+    if (arr[..., 3] == 0).any():
+        print("  Already has transparency, skipping")
+        if output_path != input_path:
+            img.save(output_path, "PNG")
+            print(f"  ✓ Saved: {output_path}")
+        print()
+        return
+    
     # Identify pixels to make transparent
-    pixels_to_remove = flood_fill_from_borders(img, black_threshold)
-    print(f"  Pixels to make transparent: {len(pixels_to_remove)}")
+    black_mask = get_black_mask(arr, black_threshold)
+    remove_mask = find_black_frame(black_mask)
+    if remove_mask is not None:
+        print("  Plain black frame, no flood fill needed")
+    elif SCIPY_AVAILABLE:
+        remove_mask = label_border_background(black_mask)
+    else:
+        remove_mask = flood_fill_from_borders(black_mask)
+    print(f"  Pixels to make transparent: {np.count_nonzero(remove_mask)}")
     
-    # Make identified pixels transparent
-    pixels = img.load()
-    for x, y in pixels_to_remove:
-        r, g, b, a = pixels[x, y]
-        pixels[x, y] = (r, g, b, 0)  # Alpha = 0 for transparency
+    # Make identified pixels transparent (alpha = 0), RGB is left untouched
+    arr[remove_mask, 3] = 0
+    img = Image.fromarray(arr)
     
     # Save
-    if output_path is None:
-        output_path = input_path
-    
     img.save(output_path, "PNG")
     print(f"  ✓ Saved: {output_path}\n")
 
 
+def process_file(input_path, black_threshold=30, backup=True):
+    """
+    Processes one PNG file of a directory (module-level so it can run in a worker process).
+    
+    Args:
+        input_path: Path to the PNG file
+        black_threshold: Threshold to consider a pixel as black
+        backup: If True, creates a backup before modification
+    """
+    # Create backup if requested
+    if backup:
+        backup_path = f"{input_path}.backup"
+        if not os.path.exists(backup_path):
+            # Byte-level copy: no decode/re-encode, identical to the original
+            shutil.copy2(input_path, backup_path)
+            print(f"  Backup created: {backup_path}")
+    
+    # Process image
+    remove_black_background(input_path, black_threshold=black_threshold)
+
+
 def process_directory(directory_path, black_threshold=30, backup=True):
     """
     Processes all PNG files in a directory.
@@ -156,19 +285,12 @@ def process_directory(directory_path, black_threshold=30, backup=True):
     
     print(f"Found {len(png_files)} PNG file(s) to process\n")
     
-    for filename in sorted(png_files):
-        input_path = os.path.join(directory_path, filename)
-        
-        # Create backup if requested
-        if backup:
-            backup_path = os.path.join(directory_path, f"{filename}.backup")
-            if not os.path.exists(backup_path):
-                img_backup = Image.open(input_path)
-                img_backup.save(backup_path, "PNG")
-                print(f"  Backup created: {backup_path}")
-        
-        # Process image
-        remove_black_background(input_path, black_threshold=black_threshold)
+    input_paths = [os.path.join(directory_path, filename) for filename in sorted(png_files)]
+    process = functools.partial(process_file, black_threshold=black_threshold, backup=backup)
+    
+    # Files are independent and CPU-bound: process them in parallel
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(process, input_paths))
 
 
 def main():